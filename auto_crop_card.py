@@ -4,23 +4,56 @@ Automatic card cropping using brightness-based detection.
 Finds the dark card rectangle against lighter backgrounds.
 """
 
+import math
+import os
 import sys
-from PIL import Image, ImageFilter
+from PIL import Image, ImageFilter, ImageStat
 import numpy as np
+from crop_utils import batch_map, first_last_true, save_cropped
 
-def find_dark_rectangle(image_path, margin_percent=3):
+def row_col_dark_counts(arr, threshold, band_rows=64):
+    """
+    Count dark pixels per row and per column in a single sweep.
+
+    Works through the image in bands of rows so the temporary mask stays
+    small instead of allocating a full-size boolean image.
+
+    Args:
+        arr: 2D grayscale array
+        threshold: Pixels below this value count as dark
+        band_rows: Number of rows thresholded at a time
+
+    Returns:
+        Tuple of (row_counts, col_counts)
+    """
+    height, width = arr.shape
+    row_counts = np.empty(height, dtype=np.int32)
+    col_counts = np.zeros(width, dtype=np.int32)
+    mask = np.empty((min(band_rows, height), width), dtype=np.bool_)
+
+    for start in range(0, height, band_rows):
+        rows = arr[start:start + band_rows]
+        band = mask[:len(rows)]
+        np.less(rows, threshold, out=band)
+        # Sum the mask as 0/1 bytes: cheaper than NumPy's bool->int casting
+        band = band.view(np.uint8)
+        row_counts[start:start + band_rows] = band.sum(axis=1, dtype=np.int32)
+        col_counts += band.sum(axis=0, dtype=np.int32)
+
+    return row_counts, col_counts
+
+def find_dark_rectangle(img, margin_percent=3):
     """
     Find the dark rectangular card in the image by analyzing brightness.
 
     Args:
-        image_path: Path to input image
+        img: Opened PIL image
         margin_percent: Percentage margin to add around detected card
 
     Returns:
         Crop coordinates (left, top, right, bottom)
     """
-    # Load and convert to grayscale
-    img = Image.open(image_path)
+    # Convert to grayscale
     gray = img.convert('L')
 
     # Resize for faster processing
@@ -33,32 +66,36 @@ def find_dark_rectangle(image_path, margin_percent=3):
         gray_work = gray
         ratio = 1.0
 
-    # Convert to numpy array
-    arr = np.array(gray_work)
-
     # Calculate threshold to separate dark card from light background
     # The card is significantly darker than the marble background
-    mean_brightness = np.mean(arr)
-    std_brightness = np.std(arr)
+    # (ImageStat walks the pixels in C without copying them into numpy)
+    stat = ImageStat.Stat(gray_work)
+    mean_brightness = stat.mean[0]
+    std_brightness = stat.stddev[0]
 
     # Threshold: anything darker than mean - 1 std is likely the card
     threshold = mean_brightness - std_brightness * 0.8
-    dark_mask = arr < threshold
+
+    # For integer pixels, arr < t is the same as arr < ceil(t); a uint8
+    # scalar keeps the comparison on the uint8 path instead of upcasting
+    threshold = np.uint8(min(255, max(0, math.ceil(threshold))))
+
+    # Convert to numpy array for the masking step
+    arr = np.asarray(gray_work)
 
     # Find the bounding box of dark regions
     # Use row and column sums to find where dark pixels are concentrated
-    row_dark_count = np.sum(dark_mask, axis=1)
-    col_dark_count = np.sum(dark_mask, axis=0)
+    row_dark_count, col_dark_count = row_col_dark_counts(arr, threshold)
 
     # Find continuous regions with significant dark pixels
     # Card should have consistent dark pixels across rows/columns
     min_dark_pixels_row = gray_work.width * 0.15  # At least 15% of width
     min_dark_pixels_col = gray_work.height * 0.15  # At least 15% of height
 
-    dark_rows = np.where(row_dark_count > min_dark_pixels_row)[0]
-    dark_cols = np.where(col_dark_count > min_dark_pixels_col)[0]
+    dark_rows = first_last_true(row_dark_count > min_dark_pixels_row)
+    dark_cols = first_last_true(col_dark_count > min_dark_pixels_col)
 
-    if len(dark_rows) == 0 or len(dark_cols) == 0:
+    if dark_rows is None or dark_cols is None:
         print("⚠️  Could not detect card automatically, using center crop")
         # Fallback: center crop with reasonable margins
         margin = 0.15
@@ -69,10 +106,8 @@ def find_dark_rectangle(image_path, margin_percent=3):
         return (left, top, right, bottom)
 
     # Get the bounding box
-    top_work = dark_rows[0]
-    bottom_work = dark_rows[-1]
-    left_work = dark_cols[0]
-    right_work = dark_cols[-1]
+    top_work, bottom_work = dark_rows
+    left_work, right_work = dark_cols
 
     # Add margin (percentage of detected size)
     detected_height = bottom_work - top_work
@@ -133,13 +168,15 @@ def auto_crop_card(input_path, output_path=None, margin=3):
     if output_path is None:
         output_path = input_path
 
-    # Load image
+    # Load image (decoded once, shared with detection)
     img = Image.open(input_path)
+    img.load()
+    original_bytes = os.stat(input_path).st_size  # before output may overwrite it
     print(f"📸 Original: {img.width}x{img.height} ({img.width*img.height/1000000:.1f}MP)")
 
     # Detect card
     print("🤖 AI detecting card boundaries...")
-    left, top, right, bottom = find_dark_rectangle(input_path, margin)
+    left, top, right, bottom = find_dark_rectangle(img, margin)
 
     # Crop
     cropped = img.crop((left, top, right, bottom))
@@ -149,12 +186,11 @@ def auto_crop_card(input_path, output_path=None, margin=3):
     print(f"📐 Cropped: {cropped.width}x{cropped.height} (ratio: {ratio:.2f}:1)")
 
     # Save
-    cropped.save(output_path, quality=95, optimize=True)
+    cropped_bytes = save_cropped(cropped, output_path)
 
     # Stats
-    import os
-    original_mb = os.path.getsize(input_path) / 1024 / 1024
-    cropped_mb = os.path.getsize(output_path) / 1024 / 1024
+    original_mb = original_bytes / 1024 / 1024
+    cropped_mb = cropped_bytes / 1024 / 1024
     savings = ((original_mb - cropped_mb) / original_mb) * 100
 
     print(f"💾 Saved: {output_path}")
@@ -166,12 +202,19 @@ if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("🎴 Auto Card Cropper - AI-powered, zero human input")
         print("\nUsage: python auto_crop_card.py <input> [output] [margin%]")
+        print("       python auto_crop_card.py --batch <input> [input ...]")
         print("\nExamples:")
         print("  python auto_crop_card.py Tip_011/Tip011.png")
         print("  python auto_crop_card.py Tip_011/Tip011.png Tip_011/cropped.png")
         print("  python auto_crop_card.py Tip_011/Tip011.png Tip_011/cropped.png 5")
+        print("  python auto_crop_card.py --batch Tip_011/Tip011.png Tip_012/Tip0012.png")
         sys.exit(1)
 
+    if sys.argv[1] == "--batch":
+        failed = batch_map(auto_crop_card, sys.argv[2:])
+        print(f"\n✨ Done! {len(sys.argv) - 2 - len(failed)} cards cropped automatically with AI.")
+        sys.exit(1 if failed else 0)
+
     input_path = sys.argv[1]
     output_path = sys.argv[2] if len(sys.argv) > 2 else input_path
     margin = int(sys.argv[3]) if len(sys.argv) > 3 else 3
@@ -4,54 +4,56 @@ Crop developer card images to remove background.
 This script detects the card boundaries and crops to just the card.
 """
 
+import math
 import sys
-from PIL import Image, ImageFilter, ImageOps
+from PIL import Image, ImageOps, ImageStat
 import numpy as np
+from crop_utils import batch_map, first_last_true, save_cropped
 
-def find_card_boundaries(image_path, padding=20):
+def find_card_boundaries(img, padding=20):
     """
     Detect card boundaries by finding the dark rectangle in the image.
 
     Args:
-        image_path: Path to the input image
+        img: Opened PIL image
         padding: Extra pixels to add around detected boundaries
 
     Returns:
         Tuple of (left, top, right, bottom) coordinates
     """
-    # Load image
-    img = Image.open(image_path)
-
     # Convert to grayscale
     gray = img.convert('L')
 
-    # Apply edge detection
-    edges = gray.filter(ImageFilter.FIND_EDGES)
-
-    # Convert to numpy array for processing
-    img_array = np.array(gray)
-
     # Find dark regions (card is typically darker than background)
     # Threshold to find dark areas
-    threshold = np.mean(img_array) - np.std(img_array) * 0.5
-    binary = img_array < threshold
+    # (ImageStat walks the pixels in C without copying them into numpy)
+    stat = ImageStat.Stat(gray)
+    threshold = stat.mean[0] - stat.stddev[0] * 0.5
+
+    # For integer pixels, arr < t is the same as arr < ceil(t)
+    threshold = np.uint8(min(255, max(0, math.ceil(threshold))))
+
+    # Convert to numpy array for processing
+    img_array = np.asarray(gray)
 
     # Find rows and columns with significant dark content
-    row_has_dark = np.any(binary, axis=1)
-    col_has_dark = np.any(binary, axis=0)
+    # (a row/column has a dark pixel iff its minimum is below the threshold,
+    # so reduce the uint8 array directly instead of building a boolean mask)
+    row_has_dark = img_array.min(axis=1) < threshold
+    col_has_dark = img_array.min(axis=0) < threshold
 
     # Find boundaries
-    rows_with_content = np.where(row_has_dark)[0]
-    cols_with_content = np.where(col_has_dark)[0]
+    rows_with_content = first_last_true(row_has_dark)
+    cols_with_content = first_last_true(col_has_dark)
 
-    if len(rows_with_content) == 0 or len(cols_with_content) == 0:
+    if rows_with_content is None or cols_with_content is None:
         print("Could not detect card boundaries automatically.")
         return None
 
     top = max(0, rows_with_content[0] - padding)
-    bottom = min(img.height, rows_with_content[-1] + padding)
+    bottom = min(img.height, rows_with_content[1] + padding)
     left = max(0, cols_with_content[0] - padding)
-    right = min(img.width, cols_with_content[-1] + padding)
+    right = min(img.width, cols_with_content[1] + padding)
 
     return (left, top, right, bottom)
 
@@ -67,12 +69,13 @@ def crop_card(input_path, output_path=None, padding=20):
     if output_path is None:
         output_path = input_path
 
-    # Load original image
+    # Load original image (decoded once, shared with detection)
     img = Image.open(input_path)
+    img.load()
     print(f"Original image size: {img.width}x{img.height}")
 
     # Find boundaries
-    boundaries = find_card_boundaries(input_path, padding)
+    boundaries = find_card_boundaries(img, padding=padding)
 
     if boundaries is None:
         print("Using manual crop approach...")
@@ -92,7 +95,7 @@ def crop_card(input_path, output_path=None, padding=20):
     print(f"Cropped image size: {cropped.width}x{cropped.height}")
 
     # Save
-    cropped.save(output_path, quality=95, optimize=True)
+    save_cropped(cropped, output_path)
     print(f"Saved cropped image to: {output_path}")
 
     return output_path
@@ -100,9 +103,14 @@ def crop_card(input_path, output_path=None, padding=20):
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python crop_card.py <input_image> [output_image] [padding]")
+        print("       python crop_card.py --batch <input_image> [input_image ...]")
         print("Example: python crop_card.py Tip_011/Tip011.png")
         sys.exit(1)
 
+    if sys.argv[1] == "--batch":
+        failed = batch_map(crop_card, sys.argv[2:])
+        sys.exit(1 if failed else 0)
+
     input_path = sys.argv[1]
     output_path = sys.argv[2] if len(sys.argv) > 2 else None
     padding = int(sys.argv[3]) if len(sys.argv) > 3 else 20
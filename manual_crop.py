@@ -7,6 +7,7 @@ Specify exactly how much to crop from each side.
 import sys
 from PIL import Image
 import os
+from crop_utils import save_cropped
 
 def manual_crop_percent(input_path, output_path, top=15, bottom=15, left=20, right=20):
     """
@@ -22,6 +23,7 @@ def manual_crop_percent(input_path, output_path, top=15, bottom=15, left=20, rig
     """
     img = Image.open(input_path)
     width, height = img.size
+    original_bytes = os.stat(input_path).st_size  # before output may overwrite it
 
     print(f"📸 Original: {width}x{height}")
     print(f"✂️  Cropping: {top}% top, {bottom}% bottom, {left}% left, {right}% right")
@@ -57,11 +59,11 @@ def manual_crop_percent(input_path, output_path, top=15, bottom=15, left=20, rig
         print("✅ Good aspect ratio for a card!")
 
     # Save
-    cropped.save(output_path, quality=95, optimize=True)
+    cropped_bytes = save_cropped(cropped, output_path)
 
     # Stats
-    original_mb = os.path.getsize(input_path) / 1024 / 1024
-    cropped_mb = os.path.getsize(output_path) / 1024 / 1024
+    original_mb = original_bytes / 1024 / 1024
+    cropped_mb = cropped_bytes / 1024 / 1024
     savings = ((original_mb - cropped_mb) / original_mb) * 100
 
     print(f"💾 Saved: {output_path}")
@@ -83,6 +85,7 @@ def manual_crop_pixels(input_path, output_path, top, bottom, left, right):
     """
     img = Image.open(input_path)
     width, height = img.size
+    original_bytes = os.stat(input_path).st_size  # before output may overwrite it
 
     print(f"📸 Original: {width}x{height}")
     print(f"✂️  Cropping: {top}px top, {bottom}px bottom, {left}px left, {right}px right")
@@ -111,11 +114,11 @@ def manual_crop_pixels(input_path, output_path, top, bottom, left, right):
         print(f"⚠️  Ratio {ratio:.2f} may need adjustment")
 
     # Save
-    cropped.save(output_path, quality=95, optimize=True)
+    cropped_bytes = save_cropped(cropped, output_path)
 
     # Stats
-    original_mb = os.path.getsize(input_path) / 1024 / 1024
-    cropped_mb = os.path.getsize(output_path) / 1024 / 1024
+    original_mb = original_bytes / 1024 / 1024
+    cropped_mb = cropped_bytes / 1024 / 1024
     savings = ((original_mb - cropped_mb) / original_mb) * 100
 
     print(f"💾 Saved: {output_path}")
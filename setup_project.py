@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 def create_project_structure():
     base_path = "."
@@ -16,7 +17,7 @@ def create_project_structure():
 - [Link to documentation]
 """
 
-    for i in range(1, 101):
+    def create_tip(i):
         # Format folder name with leading zeros, e.g., Tip_001, Tip_099, Tip_100
         folder_name = f"Tip_{i:03d}"
         folder_path = os.path.join(base_path, folder_name)
@@ -27,7 +28,11 @@ def create_project_structure():
         # Create README.md
         readme_path = os.path.join(folder_path, "README.md")
         with open(readme_path, "w") as f:
-            f.write(template.format(day=i))
+            f.write(template.format_map({"day": i}))
+
+    # Each folder is independent, so overlap the filesystem round-trips
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        list(executor.map(create_tip, range(1, 101)))
             
     print("Successfully created folders Day_001 to Day_100 with README.md files.")
 
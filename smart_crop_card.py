@@ -4,58 +4,57 @@ Smart card cropping using edge detection and contour analysis.
 Automatically detects and crops developer cards with no human input.
 """
 
+import os
 import sys
-from PIL import Image, ImageFilter, ImageDraw, ImageStat
+from PIL import Image, ImageDraw, ImageStat
 import numpy as np
+from crop_utils import (batch_map, first_last_true, find_edges,
+                        max_filter, percentile_threshold, save_cropped)
 
-def find_card_contour(image_path, debug=False):
+def find_card_contour(img, debug=False):
     """
     Use edge detection and contour analysis to find the card.
 
     Args:
-        image_path: Path to input image
+        img: Opened PIL image
         debug: If True, show detection steps
 
     Returns:
         Tuple of (left, top, right, bottom) crop coordinates
     """
-    # Load image
-    img = Image.open(image_path)
-    original_size = (img.width, img.height)
-
     # Resize for faster processing (maintain aspect ratio)
     max_dimension = 1000
     if img.width > max_dimension or img.height > max_dimension:
         ratio = min(max_dimension / img.width, max_dimension / img.height)
         new_size = (int(img.width * ratio), int(img.height * ratio))
-        working_img = img.resize(new_size, Image.Resampling.LANCZOS)
+        # reducing_gap box-reduces by an integer factor first, so LANCZOS only
+        # filters a ~2x larger image; boxes match a full LANCZOS resize
+        working_img = img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
         scale_factor = ratio
     else:
-        working_img = img.copy()
+        working_img = img  # only read below; convert() makes the new image
         scale_factor = 1.0
 
     # Convert to grayscale
     gray = working_img.convert('L')
 
     # Enhance edges
-    edges = gray.filter(ImageFilter.FIND_EDGES)
-    edges = edges.filter(ImageFilter.MaxFilter(5))  # Dilate edges
-
-    # Convert to numpy for analysis
-    edge_array = np.array(edges)
+    edge_array = find_edges(np.asarray(gray))
+    edge_array = max_filter(edge_array, 5)  # Dilate edges
 
     # Find strong edges (potential card boundaries)
-    threshold = np.percentile(edge_array, 90)  # Top 10% of edges
-    strong_edges = edge_array > threshold
+    threshold = percentile_threshold(edge_array, 90)  # Top 10% of edges
 
     # Find bounding box of strong edges
-    rows = np.any(strong_edges, axis=1)
-    cols = np.any(strong_edges, axis=0)
+    # (a row/column has a strong edge iff its maximum is above the threshold,
+    # so reduce the uint8 array directly instead of building a boolean mask)
+    rows = edge_array.max(axis=1) > threshold
+    cols = edge_array.max(axis=0) > threshold
 
-    row_indices = np.where(rows)[0]
-    col_indices = np.where(cols)[0]
+    row_bounds = first_last_true(rows)
+    col_bounds = first_last_true(cols)
 
-    if len(row_indices) == 0 or len(col_indices) == 0:
+    if row_bounds is None or col_bounds is None:
         print("Could not detect card edges. Using center crop.")
         # Fallback to center crop
         margin_h = int(working_img.height * 0.15)
@@ -65,8 +64,8 @@ def find_card_contour(image_path, debug=False):
                 scale_factor)
 
     # Get initial boundaries
-    top, bottom = row_indices[0], row_indices[-1]
-    left, right = col_indices[0], col_indices[-1]
+    top, bottom = row_bounds
+    left, right = col_bounds
 
     # Refine by finding the largest rectangle of edges
     # (card typically has strong edges on all sides)
@@ -124,13 +123,15 @@ def crop_card_smart(input_path, output_path=None):
     if output_path is None:
         output_path = input_path
 
-    # Load original image
+    # Load original image (decoded once, shared with detection)
     img = Image.open(input_path)
+    img.load()
+    original_bytes = os.stat(input_path).st_size  # before output may overwrite it
     print(f"📸 Original image size: {img.width}x{img.height}")
 
     # Detect card boundaries
     print("🔍 Detecting card boundaries...")
-    left, top, right, bottom, scale = find_card_contour(input_path)
+    left, top, right, bottom, scale = find_card_contour(img)
 
     # Scale coordinates back to original image size
     left = int(left / scale)
@@ -146,13 +147,12 @@ def crop_card_smart(input_path, output_path=None):
 
     print(f"✅ Cropped size: {cropped.width}x{cropped.height} (ratio: {cropped_ratio:.2f})")
 
-    # Save with optimization
-    cropped.save(output_path, quality=95, optimize=True)
+    # Save
+    cropped_bytes = save_cropped(cropped, output_path)
 
     # Show file size reduction
-    import os
-    original_size = os.path.getsize(input_path) / 1024 / 1024  # MB
-    cropped_size = os.path.getsize(output_path) / 1024 / 1024
+    original_size = original_bytes / 1024 / 1024  # MB
+    cropped_size = cropped_bytes / 1024 / 1024
     reduction = ((original_size - cropped_size) / original_size) * 100 if original_size > 0 else 0
 
     print(f"💾 Saved to: {output_path}")
@@ -163,10 +163,17 @@ def crop_card_smart(input_path, output_path=None):
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python smart_crop_card.py <input_image> [output_image]")
+        print("       python smart_crop_card.py --batch <input_image> [input_image ...]")
         print("Example: python smart_crop_card.py Tip_011/Tip011.png")
         print("         python smart_crop_card.py Tip_011/Tip011.png Tip_011/Tip011_cropped.png")
+        print("         python smart_crop_card.py --batch Tip_011/Tip011.png Tip_012/Tip0012.png")
         sys.exit(1)
 
+    if sys.argv[1] == "--batch":
+        failed = batch_map(crop_card_smart, sys.argv[2:])
+        print(f"\n✨ Done! {len(sys.argv) - 2 - len(failed)} cards cropped successfully.")
+        sys.exit(1 if failed else 0)
+
     input_path = sys.argv[1]
     output_path = sys.argv[2] if len(sys.argv) > 2 else input_path
 
@@ -4,81 +4,137 @@ Smart Card Cropper v2 - Enhanced edge detection for dark backgrounds.
 Works with both light (marble) and dark (wooden) backgrounds.
 """
 
+import json
+import os
 import sys
-from PIL import Image, ImageFilter, ImageEnhance
+from PIL import Image, ImageStat
 import numpy as np
+from crop_utils import (batch_map, first_last_true, find_edges,
+                        max_filter, percentile_threshold, save_cropped)
 
-def find_card_by_edges(image_path, margin_percent=3):
+# Longest side of the working image used for edge analysis
+EDGE_MAX_DIM = 1200
+
+# Bump whenever detect_card_box() can return a different box for the same
+# image, so boxes cached by an older detector are not reused
+DETECTOR_VERSION = 2
+
+# On-disk cache of detected card boxes (see cached_card_box)
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'smart_crop_v2.json')
+CACHE_MAX_ENTRIES = 256
+
+def row_col_edge_counts(edge_array, threshold, band_rows=64):
     """
-    Find card by detecting strong rectangular edges.
-    Works better with dark backgrounds.
+    Count strong edge pixels per row and per column in a single sweep.
+
+    Works through the image in bands of rows so the temporary mask stays
+    small instead of allocating a full-size boolean image.
 
     Args:
-        image_path: Path to input image
-        margin_percent: Margin to add around card
+        edge_array: 2D uint8 edge magnitudes
+        threshold: Pixels above this value count as strong edges
+        band_rows: Number of rows thresholded at a time
 
     Returns:
-        Crop coordinates (left, top, right, bottom)
+        Tuple of (row_counts, col_counts)
     """
-    # Load image
-    img = Image.open(image_path)
+    height, width = edge_array.shape
+    threshold = np.uint8(threshold)
+    row_counts = np.empty(height, dtype=np.int32)
+    col_counts = np.zeros(width, dtype=np.int32)
+    mask = np.empty((min(band_rows, height), width), dtype=np.bool_)
+
+    for start in range(0, height, band_rows):
+        rows = edge_array[start:start + band_rows]
+        band = mask[:len(rows)]
+        np.greater(rows, threshold, out=band)
+        # Sum the mask as 0/1 bytes: cheaper than NumPy's bool->int casting
+        band = band.view(np.uint8)
+        row_counts[start:start + band_rows] = band.sum(axis=1, dtype=np.int32)
+        col_counts += band.sum(axis=0, dtype=np.int32)
+
+    return row_counts, col_counts
+
+def contrast_lut(gray, factor):
+    """
+    Lookup table equivalent to ImageEnhance.Contrast(gray).enhance(factor).
+
+    Args:
+        gray: Grayscale PIL image
+        factor: Contrast factor (1.0 = unchanged)
+
+    Returns:
+        256-entry uint8 array mapping input to output intensities
+    """
+    # Same rounded mean ImageEnhance.Contrast uses as its pivot
+    mean = int(ImageStat.Stat(gray).mean[0] + 0.5)
+    lut = mean + factor * (np.arange(256) - mean)
+    return np.clip(lut.astype(np.int32), 0, 255).astype(np.uint8)
+
+def detect_card_box(img):
+    """
+    Run the edge analysis and return the detected card box, without margin.
+
+    Args:
+        img: Opened PIL image
+
+    Returns:
+        Tuple of (left, top, right, bottom, work_width, work_height, ratio)
+        in working-image coordinates, or None if no card edges were found
+    """
+    width, height = img.size
 
     # Resize for faster processing
-    max_dim = 1200
-    if max(img.width, img.height) > max_dim:
-        ratio = max_dim / max(img.width, img.height)
-        work_size = (int(img.width * ratio), int(img.height * ratio))
-        work_img = img.resize(work_size, Image.Resampling.LANCZOS)
-    else:
-        work_img = img.copy()
-        ratio = 1.0
+    # (reducing_gap box-reduces by an integer factor first, so LANCZOS only
+    # filters a ~3x larger image; boxes match a full LANCZOS resize)
+    ratio = min(1.0, EDGE_MAX_DIM / max(width, height))
+    work_size = (int(width * ratio), int(height * ratio))
+    work_img = img  # only read below; convert() makes the new image
+    if img.size != work_size:
+        work_img = img.resize(work_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
 
     # Convert to grayscale
+    # (after resizing: downscaling the grayscale image instead shifts weak
+    # edges enough to move the detected box on some sample cards)
     gray = work_img.convert('L')
 
     # Enhance contrast to make edges more visible
-    enhancer = ImageEnhance.Contrast(gray)
-    gray = enhancer.enhance(2.0)
+    # (same result as ImageEnhance.Contrast(gray).enhance(2.0), applied as
+    # a 256-entry lookup table instead of building and blending a second image)
+    gray_array = contrast_lut(gray, 2.0)[np.asarray(gray)]
 
     # Apply strong edge detection
-    edges = gray.filter(ImageFilter.FIND_EDGES)
-    edges = edges.filter(ImageFilter.MaxFilter(3))  # Dilate edges
-
-    # Convert to numpy
-    edge_array = np.array(edges)
+    edge_array = find_edges(gray_array)
+    edge_array = max_filter(edge_array, 3)  # Dilate edges
 
     # Find strong edges (top 15% of edge strengths)
-    threshold = np.percentile(edge_array[edge_array > 0], 85)
-    strong_edges = edge_array > threshold
+    threshold = percentile_threshold(edge_array, 85, ignore_zeros=True)
+
+    # Nothing can be above 255: a flat image has no non-zero edges at all
+    # (the percentile then lands past the last bin), so there is no card
+    if threshold >= 255:
+        return None
 
     # Look for the rectangular card boundary
     # Cards have strong edges on all four sides
 
     # Analyze row by row - find rows with significant edge pixels
-    row_edge_count = np.sum(strong_edges, axis=1)
-    col_edge_count = np.sum(strong_edges, axis=0)
+    row_edge_count, col_edge_count = row_col_edge_counts(edge_array, threshold)
 
     # Find the main rectangular region
     # Look for continuous region with edge pixels
-    min_edge_pixels_row = work_img.width * 0.08  # 8% of width
-    min_edge_pixels_col = work_img.height * 0.08  # 8% of height
-
-    edge_rows = row_edge_count > min_edge_pixels_row
-    edge_cols = col_edge_count > min_edge_pixels_col
+    min_edge_pixels_row = gray.width * 0.08  # 8% of width
+    min_edge_pixels_col = gray.height * 0.08  # 8% of height
 
-    # Find the largest continuous region
-    edge_row_indices = np.where(edge_rows)[0]
-    edge_col_indices = np.where(edge_cols)[0]
+    edge_rows = first_last_true(row_edge_count > min_edge_pixels_row)
+    edge_cols = first_last_true(col_edge_count > min_edge_pixels_col)
 
-    if len(edge_row_indices) == 0 or len(edge_col_indices) == 0:
-        print("⚠️  Could not detect card edges clearly")
-        return fallback_center_crop(img)
+    if edge_rows is None or edge_cols is None:
+        return None
 
     # Get boundaries
-    top_work = edge_row_indices[0]
-    bottom_work = edge_row_indices[-1]
-    left_work = edge_col_indices[0]
-    right_work = edge_col_indices[-1]
+    top_work, bottom_work = edge_rows
+    left_work, right_work = edge_cols
 
     # Refine by looking at edge density
     # The card should have dense edges at its boundaries
@@ -103,14 +159,35 @@ def find_card_by_edges(image_path, margin_percent=3):
         top_work = int(center_y - card_height / 2)
         bottom_work = int(center_y + card_height / 2)
 
+    return (int(left_work), int(top_work), int(right_work), int(bottom_work),
+            gray.width, gray.height, ratio)
+
+def apply_card_margin(image_size, box, margin_percent=3):
+    """
+    Add margin to a detect_card_box() result and scale it to image coordinates.
+
+    Args:
+        image_size: Full-resolution (width, height) of the image
+        box: Result of detect_card_box() for that image
+        margin_percent: Margin to add around card
+
+    Returns:
+        Crop coordinates (left, top, right, bottom)
+    """
+    if box is None:
+        print("⚠️  Could not detect card edges clearly")
+        return fallback_center_crop(image_size)
+
+    left_work, top_work, right_work, bottom_work, work_width, work_height, ratio = box
+
     # Add margin
     margin_h = int((bottom_work - top_work) * margin_percent / 100)
     margin_w = int((right_work - left_work) * margin_percent / 100)
 
     top_work = max(0, top_work - margin_h)
-    bottom_work = min(work_img.height, bottom_work + margin_h)
+    bottom_work = min(work_height, bottom_work + margin_h)
     left_work = max(0, left_work - margin_w)
-    right_work = min(work_img.width, right_work + margin_w)
+    right_work = min(work_width, right_work + margin_w)
 
     # Scale back to original coordinates
     left = int(left_work / ratio)
@@ -119,23 +196,87 @@ def find_card_by_edges(image_path, margin_percent=3):
     bottom = int(bottom_work / ratio)
 
     # Ensure within bounds
+    width, height = image_size
     left = max(0, left)
     top = max(0, top)
-    right = min(img.width, right)
-    bottom = min(img.height, bottom)
+    right = min(width, right)
+    bottom = min(height, bottom)
 
     return (left, top, right, bottom)
 
-def fallback_center_crop(img):
+def find_card_by_edges(img, margin_percent=3):
+    """
+    Find card by detecting strong rectangular edges.
+    Works better with dark backgrounds.
+
+    Args:
+        img: Opened PIL image
+        margin_percent: Margin to add around card
+
+    Returns:
+        Crop coordinates (left, top, right, bottom)
+    """
+    return apply_card_margin(img.size, detect_card_box(img), margin_percent)
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def cached_card_box(input_path, img):
+    """
+    detect_card_box(img), remembered on disk between runs.
+
+    Keyed on the file's real path, modification time, the analysis size
+    and DETECTOR_VERSION, so re-running with another margin skips the edge
+    analysis while an edited file or a changed detector is analysed again.
+
+    Args:
+        input_path: Path img was loaded from
+        img: Opened PIL image
+
+    Returns:
+        Same as detect_card_box(img)
+    """
+    st = os.stat(input_path)
+    key = (f"{os.path.realpath(input_path)}|{st.st_mtime_ns}|{EDGE_MAX_DIM}"
+           f"|v{DETECTOR_VERSION}")
+
+    cache = _load_cache()
+    if key in cache:
+        print("♻️  Reusing cached card detection")
+        box = cache[key]
+        return tuple(box) if box is not None else None
+
+    box = detect_card_box(img)
+    cache[key] = box
+    cache = dict(list(cache.items())[-CACHE_MAX_ENTRIES:])  # keep the newest
+
+    # Best effort: write atomically, and never fail a crop over the cache
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        tmp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError:
+        pass
+
+    return box
+
+def fallback_center_crop(image_size):
     """Fallback: center crop with reasonable margins"""
+    width, height = image_size
     margin = 0.18
-    left = int(img.width * margin)
-    top = int(img.height * margin)
-    right = int(img.width * (1 - margin))
-    bottom = int(img.height * (1 - margin))
+    left = int(width * margin)
+    top = int(height * margin)
+    right = int(width * (1 - margin))
+    bottom = int(height * (1 - margin))
     return (left, top, right, bottom)
 
-def smart_crop_v2(input_path, output_path=None, margin=3):
+def smart_crop_v2(input_path, output_path=None, margin=3, use_cache=True):
     """
     Enhanced cropping that works with dark backgrounds.
 
@@ -143,6 +284,7 @@ def smart_crop_v2(input_path, output_path=None, margin=3):
         input_path: Input image path
         output_path: Output path (None = overwrite)
         margin: Margin percentage
+        use_cache: Reuse and store detections in CACHE_PATH
 
     Returns:
         Output path
@@ -150,13 +292,16 @@ def smart_crop_v2(input_path, output_path=None, margin=3):
     if output_path is None:
         output_path = input_path
 
-    # Load image
+    # Load image (decoded once, shared with detection)
     img = Image.open(input_path)
+    img.load()
+    original_bytes = os.stat(input_path).st_size  # before output may overwrite it
     print(f"📸 Original: {img.width}x{img.height} ({img.width*img.height/1000000:.1f}MP)")
 
     # Detect card using enhanced edge detection
     print("🤖 AI detecting card with enhanced edge analysis...")
-    left, top, right, bottom = find_card_by_edges(input_path, margin)
+    box = cached_card_box(input_path, img) if use_cache else detect_card_box(img)
+    left, top, right, bottom = apply_card_margin(img.size, box, margin)
 
     # Crop
     cropped = img.crop((left, top, right, bottom))
@@ -172,12 +317,11 @@ def smart_crop_v2(input_path, output_path=None, margin=3):
         print("    Example: python3 smart_crop_v2.py input.png output.png 5")
 
     # Save
-    cropped.save(output_path, quality=95, optimize=True)
+    cropped_bytes = save_cropped(cropped, output_path)
 
     # Stats
-    import os
-    original_mb = os.path.getsize(input_path) / 1024 / 1024
-    cropped_mb = os.path.getsize(output_path) / 1024 / 1024
+    original_mb = original_bytes / 1024 / 1024
+    cropped_mb = cropped_bytes / 1024 / 1024
     savings = ((original_mb - cropped_mb) / original_mb) * 100 if original_mb > 0 else 0
 
     print(f"💾 Saved: {output_path}")
@@ -186,22 +330,34 @@ def smart_crop_v2(input_path, output_path=None, margin=3):
     return output_path
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    # --no-cache (anywhere on the command line): detect again, don't touch CACHE_PATH
+    use_cache = "--no-cache" not in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--no-cache"]
+
+    if not args:
         print("🎴 Smart Card Cropper v2 - Works with dark backgrounds!")
         print("\nUsage: python3 smart_crop_v2.py <input> [output] [margin%]")
+        print("       python3 smart_crop_v2.py --batch <input> [input ...]")
+        print("       Add --no-cache to skip the detection cache in ~/.cache")
         print("\nExamples:")
         print("  python3 smart_crop_v2.py Tip_012/Tip012.png")
         print("  python3 smart_crop_v2.py Tip_012/Tip012.png Tip_012/cropped.png")
         print("  python3 smart_crop_v2.py Tip_012/Tip012.png Tip_012/cropped.png 5")
+        print("  python3 smart_crop_v2.py --batch Tip_011/Tip011.png Tip_012/Tip0012.png")
         print("\nThis version uses edge detection and works better with:")
         print("  ✓ Dark wooden backgrounds")
         print("  ✓ Light marble backgrounds")
         print("  ✓ Mixed lighting conditions")
         sys.exit(1)
 
-    input_path = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) > 2 else input_path
-    margin = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    if args[0] == "--batch":
+        failed = batch_map(smart_crop_v2, args[1:], use_cache=use_cache)
+        print(f"\n✨ Done! {len(args) - 1 - len(failed)} cards cropped with enhanced detection.")
+        sys.exit(1 if failed else 0)
+
+    input_path = args[0]
+    output_path = args[1] if len(args) > 1 else input_path
+    margin = int(args[2]) if len(args) > 2 else 3
 
-    smart_crop_v2(input_path, output_path, margin)
+    smart_crop_v2(input_path, output_path, margin, use_cache)
     print("\n✨ Done! Enhanced cropping complete.")